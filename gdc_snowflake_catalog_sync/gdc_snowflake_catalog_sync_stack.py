@@ -3,11 +3,15 @@
 
 
 from aws_cdk import Duration, RemovalPolicy, Stack
+from aws_cdk import aws_dynamodb as dynamodb
 from aws_cdk import aws_events as _events
 from aws_cdk import aws_events_targets as events_targets
 from aws_cdk import aws_iam as iam
-from aws_cdk import aws_lambda as _lambda  # aws_sqs as sqs,
+from aws_cdk import aws_lambda as _lambda
+from aws_cdk import aws_lambda_event_sources as event_sources
+from aws_cdk import aws_s3 as s3
 from aws_cdk import aws_secretsmanager as secrets
+from aws_cdk import aws_sqs as sqs
 from constructs import Construct
 from gdc_snowflake_catalog_sync.snowflake_security_provider import SnowflakeSecurityProvider
 from aws_cdk.aws_iam import Effect
@@ -54,6 +58,21 @@ class GdcSnowflakeCatalogSyncStack(Stack):
         #
         # Lambda function with target and secret passed as environment parameters
         #
+        environment = {
+            "TARGET_TYPE": target_type,
+            "SECRET_ARN": secret.secret_arn,
+        }
+        export_details = self.node.try_get_context("EXPORT_SETTINGS") or {}
+        if target_type == "EXPORT":
+            if "s3uri" not in export_details:
+                raise ValueError("EXPORT_SETTINGS.s3uri is required for TARGET_TYPE EXPORT, Lambda storage is ephemeral")
+            environment.update(GdcSnowflakeCatalogSyncStack.export_environment(export_details))
+        queue_details = self.node.try_get_context("QUEUE_SETTINGS") or {}
+        queue_enabled = queue_details.get("enabled", False)
+        pipeline_details = self.node.try_get_context("PIPELINE_SETTINGS") or {}
+        environment.update(GdcSnowflakeCatalogSyncStack.pipeline_environment(pipeline_details))
+        profile_details = self.node.try_get_context("PROFILE_SETTINGS") or {}
+        environment.update(GdcSnowflakeCatalogSyncStack.profile_environment(profile_details))
         lmbda = _lambda.Function(
             self,
             "GlueDataCatalogSyncHandler" + target_type_str,
@@ -61,29 +80,90 @@ class GdcSnowflakeCatalogSyncStack(Stack):
             code=_lambda.Code.from_asset("gdc_snowflake_catalog_sync_lambda"),
             handler="gdc_snowflake_catalog_sync.handler",
             layers=[lmbdalayer],
-            environment={
-                "TARGET_TYPE": target_type,
-                "SECRET_ARN": secret.secret_arn,
-            },
+            environment=environment,
             timeout=Duration.minutes(5),
+            reserved_concurrent_executions=queue_details.get("reservedconcurrency") if queue_enabled else None,
         )
+        sync_functions = [lmbda]
+
+        #
+        # Scheduled Lambda function catching up on tables updated since the last watermark
+        #
+        catch_up_details = self.node.try_get_context("CATCHUP_SETTINGS") or {}
+        catch_up_enabled = catch_up_details.get("enabled", False)
+        if catch_up_enabled:
+            catch_up = _lambda.Function(
+                self,
+                "GlueDataCatalogSyncCatchUpHandler" + target_type_str,
+                runtime=_lambda.Runtime.PYTHON_3_9,
+                code=_lambda.Code.from_asset("gdc_snowflake_catalog_sync_lambda"),
+                handler="catch_up.handler",
+                layers=[lmbdalayer],
+                environment={
+                    **environment,
+                    **GdcSnowflakeCatalogSyncStack.catch_up_environment(catch_up_details),
+                },
+                timeout=Duration.minutes(15),
+                reserved_concurrent_executions=1,
+            )
+            sync_functions.append(catch_up)
 
         #
         # Lambda role permission to access secrets and glue resources
         #
-        secret.grant_read(lmbda.role)
-        lmbda.add_to_role_policy(
-            iam.PolicyStatement(effect=Effect.ALLOW,
-                                actions=[
-                                    "glue:getDatabase",
-                                    "glue:getTable"
-                                ],
-                                resources=[
-                                    f"arn:aws:glue:{self.region}:{self.account}:catalog",
-                                    f"arn:aws:glue:{self.region}:{self.account}:database/*",
-                                    f"arn:aws:glue:{self.region}:{self.account}:table/*/*",
-                                ])
-        )
+        for function in sync_functions:
+            secret.grant_read(function.role)
+            function.add_to_role_policy(
+                iam.PolicyStatement(effect=Effect.ALLOW,
+                                    actions=[
+                                        "glue:getDatabase",
+                                        "glue:getDatabases",
+                                        "glue:getTable",
+                                        "glue:getTables",
+                                        "glue:getPartitions"
+                                    ],
+                                    resources=[
+                                        f"arn:aws:glue:{self.region}:{self.account}:catalog",
+                                        f"arn:aws:glue:{self.region}:{self.account}:database/*",
+                                        f"arn:aws:glue:{self.region}:{self.account}:table/*/*",
+                                    ])
+            )
+
+        #
+        # DynamoDB table for the shared Snowflake limiter state and the catch-up watermarks
+        #
+        limiter_details = self.node.try_get_context("LIMITER_SETTINGS") or {}
+        limiter_shared = limiter_details.get("shared", False)
+        if limiter_shared or catch_up_enabled:
+            state_table = dynamodb.Table(
+                self,
+                "GlueDataCatalogSyncStateTable" + target_type_str,
+                partition_key=dynamodb.Attribute(name="pk", type=dynamodb.AttributeType.STRING),
+                billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+            )
+            if limiter_shared:
+                for function in sync_functions:
+                    state_table.grant_read_write_data(function.role)
+                    function.add_environment("STATE_TABLE", state_table.table_name)
+            if catch_up_enabled:
+                state_table.grant_read_write_data(catch_up.role)
+                catch_up.add_environment("CATCHUP_STATE_TABLE", state_table.table_name)
+
+        #
+        # Lambda role permission to stage export files on S3
+        #
+        if target_type == "EXPORT" and "s3uri" in export_details:
+            GdcSnowflakeCatalogSyncStack.grant_s3_put(
+                self, "GlueDataCatalogSyncExportBucket", export_details["s3uri"], sync_functions
+            )
+
+        #
+        # Lambda role permission to stage profiles on S3
+        #
+        if "s3uri" in profile_details:
+            GdcSnowflakeCatalogSyncStack.grant_s3_put(
+                self, "GlueDataCatalogSyncProfileBucket", profile_details["s3uri"], sync_functions
+            )
 
         #
         # Event Bridge rules to trigger Lambda Sync function
@@ -98,7 +178,64 @@ class GdcSnowflakeCatalogSyncStack(Stack):
                 }
             },
         )
-        grant.add_target(events_targets.LambdaFunction(lmbda))
+        if not queue_enabled:
+            grant.add_target(events_targets.LambdaFunction(lmbda))
+        else:
+            #
+            # SQS FIFO queue between the rule and the Lambda Sync function with one message group per table
+            #
+            dead_letter_queue = sqs.Queue(
+                self,
+                "GlueDataCatalogSyncDeadLetterQueue" + target_type_str,
+                fifo=True,
+                retention_period=Duration.days(14),
+            )
+            queue = sqs.Queue(
+                self,
+                "GlueDataCatalogSyncQueue" + target_type_str,
+                fifo=True,
+                visibility_timeout=Duration.minutes(6 * 5),
+                dead_letter_queue=sqs.DeadLetterQueue(
+                    max_receive_count=queue_details.get("maxreceivecount", 5),
+                    queue=dead_letter_queue,
+                ),
+            )
+            lmbda.add_event_source(
+                event_sources.SqsEventSource(
+                    queue,
+                    batch_size=queue_details.get("batchsize", 10),
+                    report_batch_item_failures=True,
+                )
+            )
+
+            #
+            # EventBridge SQS targets only support a static message group id,
+            # so events are queued by a Lambda function that derives it from the table
+            #
+            enqueue = _lambda.Function(
+                self,
+                "GlueDataCatalogSyncEnqueueHandler" + target_type_str,
+                runtime=_lambda.Runtime.PYTHON_3_9,
+                code=_lambda.Code.from_asset("gdc_snowflake_catalog_sync_lambda"),
+                handler="gdc_snowflake_catalog_sync_enqueue.handler",
+                environment={
+                    "QUEUE_URL": queue.queue_url,
+                },
+                timeout=Duration.seconds(30),
+            )
+            queue.grant_send_messages(enqueue)
+            grant.add_target(events_targets.LambdaFunction(enqueue))
+
+        #
+        # Event Bridge schedule to trigger Lambda Catch-up function
+        #
+        if catch_up_enabled:
+            schedule = _events.Rule(
+                self,
+                "GlueDataCatalogSyncCatchUpSchedule" + target_type_str,
+                schedule=_events.Schedule.rate(Duration.minutes(catch_up_details.get("scheduleminutes", 5))),
+            )
+            schedule.add_target(events_targets.LambdaFunction(catch_up))
 
     @staticmethod
     def secret(target_type, target_type_details):
@@ -106,6 +243,75 @@ class GdcSnowflakeCatalogSyncStack(Stack):
         Generate the secret based on target type
         """
         secret_str = None
-        if target_type == "SNOWFLAKE":
+        if target_type in ["SNOWFLAKE", "EXPORT"]:
             secret_str = SnowflakeSecurityProvider.generate_secret_string(config=target_type_details)
         return secret_str
+
+    @staticmethod
+    def grant_s3_put(scope, bucket_id, s3_uri, functions):
+        """
+        Grants the functions to put objects under an s3://bucket/prefix uri
+        """
+        bucket_name, _, prefix = s3_uri[len("s3://"):].partition("/")
+        prefix = prefix.strip("/")
+        bucket = s3.Bucket.from_bucket_name(scope, bucket_id, bucket_name)
+        for function in functions:
+            bucket.grant_put(function.role, f"{prefix}/*" if prefix else "*")
+
+    @staticmethod
+    def export_environment(export_details):
+        """
+        Maps the export settings from context to the Lambda environment
+        """
+        keys = {
+            "path": "EXPORT_PATH",
+            "s3uri": "EXPORT_S3_URI",
+            "maxfilebytes": "EXPORT_MAX_FILE_BYTES",
+            "maxfileseconds": "EXPORT_MAX_FILE_SECONDS",
+            "bufferbytes": "EXPORT_BUFFER_BYTES",
+        }
+        return {env: str(export_details[key]) for key, env in keys.items() if key in export_details}
+
+    @staticmethod
+    def pipeline_environment(pipeline_details):
+        """
+        Maps the pipeline settings from context to the Lambda environment
+        """
+        keys = {
+            "fetchconcurrency": "PIPELINE_FETCH_CONCURRENCY",
+            "renderconcurrency": "PIPELINE_RENDER_CONCURRENCY",
+            "submitconcurrency": "PIPELINE_SUBMIT_CONCURRENCY",
+            "queuesize": "PIPELINE_QUEUE_SIZE",
+        }
+        return {env: str(pipeline_details[key]) for key, env in keys.items() if key in pipeline_details}
+
+    @staticmethod
+    def profile_environment(profile_details):
+        """
+        Maps the profiling settings from context to the Lambda environment
+        """
+        keys = {
+            "samplerate": "PROFILE_SAMPLE_RATE",
+            "path": "PROFILE_DIR",
+            "s3uri": "PROFILE_S3_URI",
+            "topn": "PROFILE_TOP_N",
+        }
+        return {env: str(profile_details[key]) for key, env in keys.items() if key in profile_details}
+
+    @staticmethod
+    def catch_up_environment(catch_up_details):
+        """
+        Maps the catch-up settings from context to the Lambda environment
+        """
+        environment = {}
+        if "catalogid" in catch_up_details:
+            environment["CATCHUP_CATALOG_ID"] = str(catch_up_details["catalogid"])
+        if "databases" in catch_up_details:
+            environment["CATCHUP_DATABASES"] = ",".join(catch_up_details["databases"])
+        if "chunksize" in catch_up_details:
+            environment["CATCHUP_CHUNK_SIZE"] = str(catch_up_details["chunksize"])
+        if "concurrency" in catch_up_details:
+            environment["CATCHUP_CONCURRENCY"] = str(catch_up_details["concurrency"])
+        if "safetyseconds" in catch_up_details:
+            environment["CATCHUP_SAFETY_SECONDS"] = str(catch_up_details["safetyseconds"])
+        return environment
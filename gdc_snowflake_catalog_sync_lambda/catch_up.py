@@ -0,0 +1,121 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from gdc_snowflake_catalog_sync import add_partition_locations, glue, target
+from state_store import StateStore
+from table_definition import TableDefinition
+
+# Catch-up configuration
+catalog_id: Optional[str] = os.environ.get("CATCHUP_CATALOG_ID") or None
+databases: List[str] = [name for name in os.environ.get("CATCHUP_DATABASES", "").split(",") if name]
+chunk_size: int = int(os.environ.get("CATCHUP_CHUNK_SIZE", "50"))
+concurrency: int = int(os.environ.get("CATCHUP_CONCURRENCY", "4"))
+safety_seconds: int = int(os.environ.get("CATCHUP_SAFETY_SECONDS", "60"))
+
+# Get the watermark store, the limiter of the target only shares the table when configured
+store = StateStore.build("CATCHUP_STATE_TABLE")
+
+
+# Helper to sync a group of tables in one multi-statement request, returns False when Snowflake rejected it
+def sync_tables(database: str, tables: List[dict]) -> bool:
+    table_definitions: List[TableDefinition] = []
+    for table in tables:
+        try:
+            table_definitions += TableDefinition.from_get_table({"Table": table}) or []
+        except KeyError as err:
+            print(f"Catch-up could not read table definition {database}.{table['Name']}: missing {err}")
+    if len(table_definitions) == 0:
+        return True
+    add_partition_locations(catalog_id, table_definitions)
+    if target.synchronize(table_definitions=table_definitions) is False:
+        return False
+    # Buffering targets write the chunk out before the watermark moves past it
+    target.flush()
+    return True
+
+
+# Helper to sync the tables of a database updated after its watermark, oldest first. The watermark
+# is advanced after every synced chunk, so a run that times out keeps its progress, and it stays
+# below the next table to sync and the listing time minus a safety margin, so tables updated within
+# the same second are synced again rather than missed. The tables of a rejected chunk are synced one at
+# a time and the ones Snowflake still rejects are skipped, so a single bad table does not stop the catch-up
+def catch_up_database(database: str) -> int:
+    key = f"watermark#{catalog_id}#{database}"
+    try:
+        state = store.get(key) or {}
+        watermark = datetime.fromisoformat(state["updated"]) if "updated" in state else None
+        listed_at = datetime.now(timezone.utc)
+        tables = sorted(
+            [
+                table for table in glue.get_tables(catalog=catalog_id, database=database)
+                if watermark is None or table["UpdateTime"] > watermark
+            ],
+            key=lambda table: table["UpdateTime"],
+        )
+    except Exception as err:
+        print(f"Catch-up could not list the tables of {database}.....{err}")
+        return 0
+    if len(tables) == 0:
+        return 0
+
+    synced = 0
+    skipped = 0
+    for start in range(0, len(tables), chunk_size):
+        chunk = tables[start:start + chunk_size]
+        try:
+            if sync_tables(database, chunk):
+                synced += len(chunk)
+            else:
+                if len(chunk) > 1:
+                    print(f"Catch-up chunk of {database} failed, syncing its tables one at a time")
+                for table in chunk:
+                    if len(chunk) > 1 and sync_tables(database, [table]):
+                        synced += 1
+                    else:
+                        print(f"Catch-up skipped {database}.{table['Name']}, Snowflake rejected its statements")
+                        skipped += 1
+        except Exception as err:
+            # Errors reaching Glue or Snowflake are not specific to the tables, the chunk is retried by the next run
+            print(f"Catch-up Exception for {database}.....{err}")
+            break
+
+        updated = min(chunk[-1]["UpdateTime"], listed_at - timedelta(seconds=safety_seconds))
+        if start + chunk_size < len(tables):
+            updated = min(updated, tables[start + chunk_size]["UpdateTime"] - timedelta(microseconds=1))
+        if watermark is not None and updated <= watermark:
+            continue
+        try:
+            if not store.put(key, {**state, "updated": updated.isoformat()}):
+                print(f"Catch-up watermark of {database} was advanced by another run")
+                break
+            state = store.get(key) or {}
+            watermark = updated
+        except Exception as err:
+            print(f"Catch-up could not store the watermark of {database}.....{err}")
+            break
+
+    print(
+        f"Catch-up synced {synced} and skipped {skipped} of {len(tables)} updated tables of {database},"
+        f" watermark at {watermark}"
+    )
+    return synced
+
+
+def handler(event, context):
+    print(f"Incoming event: {event}")
+    catch_up_databases = databases or [
+        name for name in glue.get_databases(catalog=catalog_id) if "__" in name
+    ]
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(catch_up_database, catch_up_databases))
+    print(f"Catch-up synced {sum(results)} updated tables in {len(catch_up_databases)} databases")
+
+    return {
+        'statusCode': 200
+    }
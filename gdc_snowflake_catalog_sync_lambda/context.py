@@ -38,10 +38,11 @@ class Context:
 
         self._strategy = strategy
 
-    def synchronize(self, table_definitions: List[TableDefinition]) -> None:
+    def synchronize(self, table_definitions: List[TableDefinition]) -> bool:
         """
         The Context delegates some work to the Strategy object instead of
         implementing multiple versions of the algorithm on its own.
         """
 
         result = self._strategy.synchronize(table_definitions=table_definitions)
+        return result
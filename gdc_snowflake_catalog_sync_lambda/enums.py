@@ -10,3 +10,20 @@ class TargetType(Enum):
     """
     SNOWFLAKE = "SNOWFLAKE"
     LOGGING = "LOGGING"
+    EXPORT = "EXPORT"
+
+
+class PartitionStyle(Enum):
+    """
+    Defines partition layouts of the table storage
+    """
+    HIVE = "HIVE"
+    POSITIONAL = "POSITIONAL"
+    UNKNOWN = "UNKNOWN"
+
+
+class TableType(Enum):
+    """
+    Defines Glue table types that are synced differently
+    """
+    ICEBERG = "ICEBERG"
@@ -0,0 +1,255 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import List
+
+import attr
+from botocore.exceptions import ClientError
+from glue import Glue
+from s3 import S3
+from snowflake_strategy import Snowflake
+from table_definition import TableDefinition
+from target_strategy import TargetStrategy
+
+DEFAULT_EXPORT_PATH = "/tmp/gdc_export"
+DEFAULT_MAX_FILE_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_FILE_SECONDS = 900
+DEFAULT_BUFFER_BYTES = 0
+DEFAULT_LAMBDA_BUFFER_BYTES = 8 * 1024 * 1024
+
+
+class GCDExport(TargetStrategy):
+    """
+    Defines file export target.
+    Appends the rendered Snowflake DDL to a SQL script and the table definitions to a JSONL manifest,
+    so that they can be applied in bulk with SnowSQL or used to validate rendering offline.
+    When an S3 uri is configured every write is put as its own pair of chunk objects of the current part.
+    """
+
+    def __init__(
+        self,
+        renderer: Snowflake,
+        path: str = DEFAULT_EXPORT_PATH,
+        s3_uri: str = None,
+        max_file_bytes: int = DEFAULT_MAX_FILE_BYTES,
+        max_file_seconds: int = DEFAULT_MAX_FILE_SECONDS,
+        buffer_bytes: int = DEFAULT_BUFFER_BYTES,
+    ):
+        """
+        Defines export instance
+        """
+
+        self.renderer = renderer
+        self.path = path
+        self.s3_uri = s3_uri
+        self.max_file_bytes = max_file_bytes
+        self.max_file_seconds = max_file_seconds
+        self.buffer_bytes = buffer_bytes
+        self.s3 = S3() if s3_uri else None
+        self.part_name = None
+        self.part_opened = None
+        self.part_bytes = 0
+        self.part_chunks = 0
+        self.sql_buffer: List[str] = []
+        self.manifest_buffer: List[str] = []
+        self.buffered_bytes = 0
+        self.lock = threading.Lock()
+        if self.s3 is None:
+            os.makedirs(self.path, exist_ok=True)
+
+    @classmethod
+    def build(cls):
+        """
+        Build the export configuration from environment and the snowflake secrets.
+        Lambda storage is ephemeral, so the export is staged to S3. The definitions are buffered up to
+        EXPORT_BUFFER_BYTES and written out at the end of every invocation by the handler.
+        """
+
+        logging.info("Export :: build")
+        s3_uri = os.getenv("EXPORT_S3_URI")
+        if not s3_uri:
+            raise ValueError("EXPORT_S3_URI is required for the EXPORT target")
+        return GCDExport(
+            renderer=Snowflake.build(),
+            path=os.getenv("EXPORT_PATH", DEFAULT_EXPORT_PATH),
+            s3_uri=s3_uri,
+            max_file_bytes=int(os.getenv("EXPORT_MAX_FILE_BYTES", DEFAULT_MAX_FILE_BYTES)),
+            max_file_seconds=int(os.getenv("EXPORT_MAX_FILE_SECONDS", DEFAULT_MAX_FILE_SECONDS)),
+            buffer_bytes=int(os.getenv("EXPORT_BUFFER_BYTES", DEFAULT_LAMBDA_BUFFER_BYTES)),
+        )
+
+    def synchronize(self, table_definitions: List[TableDefinition]) -> bool:
+        """
+        Renders the table definitions and appends them to the export buffers
+        """
+
+        logging.info("Export :: synchronize")
+        with self.lock:
+            for table_definition in table_definitions:
+                statements = self.renderer.render_table(table_definition)
+                manifest = {
+                    "exported_at": datetime.now(timezone.utc).isoformat(),
+                    "rendered": len(statements) > 0,
+                    "statement_count": len(statements),
+                    "table_definition": attr.asdict(table_definition),
+                }
+                self.append(statements, manifest)
+            if self.buffered_bytes >= self.buffer_bytes:
+                self.write()
+        return True
+
+    def append(self, statements: List[str], manifest: dict):
+        """
+        Adds the rendered statements and manifest entry to the buffers
+        """
+
+        sql = "".join(statement + "\n" for statement in statements)
+        line = json.dumps(manifest, default=str) + "\n"
+        self.sql_buffer.append(sql)
+        self.manifest_buffer.append(line)
+        self.buffered_bytes += len(sql) + len(line)
+
+    def part_path(self, extension: str):
+        return os.path.join(self.path, f"{self.part_name}.{extension}")
+
+    def open_part(self):
+        """
+        Starts a new pair of SQL script and manifest files
+        """
+
+        timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        self.part_name = f"gdc-export-{timestamp}-{uuid.uuid4().hex[:8]}"
+        self.part_opened = time.monotonic()
+        self.part_bytes = 0
+        self.part_chunks = 0
+
+    def should_rotate(self):
+        return self.part_name is not None and (
+            self.part_bytes >= self.max_file_bytes
+            or time.monotonic() - self.part_opened >= self.max_file_seconds
+        )
+
+    def write(self):
+        """
+        Writes the buffers to the current part, rotating it by size or age.
+        Locally the buffers are appended to the part files, with an S3 uri they are put as the next chunk of the part.
+        """
+
+        if len(self.sql_buffer) == 0:
+            return
+        if self.should_rotate():
+            self.rotate()
+        if self.part_name is None:
+            self.open_part()
+        contents = {"sql": "".join(self.sql_buffer), "jsonl": "".join(self.manifest_buffer)}
+        if self.s3 is None:
+            for extension, content in contents.items():
+                with open(self.part_path(extension), "a") as part_file:
+                    part_file.write(content)
+        else:
+            self.part_chunks += 1
+            for extension, content in contents.items():
+                uri = self.s3.put_object(content, self.s3_uri, f"{self.part_name}-{self.part_chunks:05d}.{extension}")
+                print(f"Export staged to {uri}")
+        self.part_bytes += self.buffered_bytes
+        self.sql_buffer = []
+        self.manifest_buffer = []
+        self.buffered_bytes = 0
+
+    def rotate(self):
+        """
+        Completes the current part, the next flush starts a new one
+        """
+
+        if self.part_name is not None:
+            print(f"Export part completed: {self.part_name}")
+        self.part_name = None
+
+    def flush(self):
+        """
+        Writes any buffered definitions, the part stays open for the next invocation
+        """
+
+        with self.lock:
+            self.write()
+
+    def close(self):
+        """
+        Writes any buffered definitions and completes the current part
+        """
+
+        with self.lock:
+            self.write()
+            self.rotate()
+
+
+def main():
+    """
+    Exports the Snowflake DDL for whole Glue databases without calling Snowflake
+    """
+
+    parser = argparse.ArgumentParser(description="Export Snowflake DDL for Glue Data Catalog tables")
+    parser.add_argument("--config", required=True, help="JSON file shaped like the Snowflake target secret")
+    parser.add_argument("--database", required=True, action="append", help="Glue database to export, repeatable")
+    parser.add_argument("--catalog", default=None, help="Glue catalog id, defaults to the caller account")
+    parser.add_argument("--output", default="gdc_export", help="Local directory for the export files")
+    parser.add_argument("--s3-uri", default=None, help="Optional s3://bucket/prefix to stage the export files")
+    parser.add_argument("--max-file-bytes", type=int, default=DEFAULT_MAX_FILE_BYTES)
+    parser.add_argument("--max-file-seconds", type=int, default=DEFAULT_MAX_FILE_SECONDS)
+    parser.add_argument("--buffer-bytes", type=int, default=1024 * 1024)
+    args = parser.parse_args()
+
+    with open(args.config) as config_file:
+        config = json.load(config_file)
+    export = GCDExport(
+        renderer=Snowflake.from_config(config),
+        path=args.output,
+        s3_uri=args.s3_uri,
+        max_file_bytes=args.max_file_bytes,
+        max_file_seconds=args.max_file_seconds,
+        buffer_bytes=args.buffer_bytes,
+    )
+    glue = Glue()
+    exported = 0
+    failed = 0
+    try:
+        for database in args.database:
+            for table in glue.get_tables(catalog=args.catalog, database=database):
+                try:
+                    table_definitions = TableDefinition.from_get_table({"Table": table})
+                except KeyError as err:
+                    print(f"Could not read table definition {database}.{table['Name']}: missing {err}")
+                    failed += 1
+                    continue
+                if table_definitions is None:
+                    print(f"No storage descriptor for {database}.{table['Name']}")
+                    failed += 1
+                    continue
+                try:
+                    for table_definition in table_definitions:
+                        if len(table_definition.partitions) > 0 and not table_definition.is_iceberg:
+                            table_definition.partition_location = glue.get_partition_location(
+                                catalog=args.catalog, database=database, table=table_definition.name
+                            )
+                except ClientError as err:
+                    print(f"Could not read partitions of {database}.{table['Name']}: {err}")
+                    failed += 1
+                    continue
+                export.synchronize(table_definitions)
+                exported += len(table_definitions)
+    finally:
+        export.close()
+        print(f"Exported {exported} tables, {failed} tables could not be read")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,14 +2,18 @@
 # SPDX-License-Identifier: MIT-0
 
 
+import json
 import logging
 import os
 from typing import List
 
 from context import Context
 from enums import TargetType
+from export_strategy import GCDExport
 from glue import Glue
 from logging_strategy import GCDLogging
+from pipeline import Pipeline
+from profiling import profiled
 from snowflake_strategy import Snowflake
 from table_definition import TableDefinition
 from botocore.exceptions import ClientError
@@ -20,6 +24,8 @@ if target_type is TargetType.SNOWFLAKE:
     target = Snowflake.build()
 elif target_type is TargetType.LOGGING:
     target = GCDLogging.build()
+elif target_type is TargetType.EXPORT:
+    target = GCDExport.build()
 
 # Get the service resource
 glue = Glue()
@@ -39,23 +45,77 @@ def get_table_detail(event: dict) -> List[TableDefinition]:
         )
     except ClientError as err:
         print(f"Get Table Exception.....{err}")
+        raise
 
-    return TableDefinition.from_get_table(get_table_response)
+    table_definitions = TableDefinition.from_get_table(get_table_response)
+    add_partition_locations(catalog_id, table_definitions)
+    return table_definitions
 
 
-def handler(event, context):
-    print(f"Incoming event: {event}")
-    # Sync with target system
-    print(f"Syncing table definition with {target_type}")
+# Helper to add a sample partition location used to detect the partition layout of the tables
+def add_partition_locations(catalog_id: str, table_definitions: List[TableDefinition]):
+    for table_definition in table_definitions or []:
+        if len(table_definition.partitions) == 0 or table_definition.is_iceberg:
+            continue
+        try:
+            table_definition.partition_location = glue.get_partition_location(
+                catalog=catalog_id, database=table_definition.database, table=table_definition.name
+            )
+        except ClientError as err:
+            print(f"Get Partitions Exception.....{err}")
+
+
+# Helper to sync the Glue table of a single CloudTrail event, returns False when the sync has to be retried
+def sync_event(event: dict) -> bool:
     event_detail = event["detail"]
     glue_table_definitions = get_table_detail(event_detail)
     if glue_table_definitions is not None:
-        Context(strategy=target).synchronize(
+        result = Context(strategy=target).synchronize(
             table_definitions=glue_table_definitions
         )
         print(f"Glue Table Sync Attempted with Snowflake: {event}")
+        return result is not False
     else:
         print(f"Glue Table Extract Failed: {event}")
+        return True
+
+
+# Helper to sync a batch of SQS FIFO messages. Glue fetches, rendering and target submits of the
+# messages run in a pipeline; messages of a message group (one Glue table) after a failed message
+# are reported as failed as well to keep the updates of a table in order.
+def sync_records(records: List[dict]) -> dict:
+    pipeline = Pipeline.build(
+        strategy=target,
+        fetch=lambda body: get_table_detail(json.loads(body)["detail"]),
+    )
+    results = pipeline.run(
+        [(record["attributes"]["MessageGroupId"], record["body"]) for record in records]
+    )
+    batch_item_failures = [
+        {"itemIdentifier": record["messageId"]}
+        for record, result in zip(records, results)
+        if not result
+    ]
+
+    print(f"Glue Table Sync failed for {len(batch_item_failures)} of {len(records)} messages")
+    return {
+        'batchItemFailures': batch_item_failures
+    }
+
+
+@profiled("handler", sample=True)
+def handler(event, context):
+    print(f"Incoming event: {event}")
+    # Sync with target system
+    print(f"Syncing table definition with {target_type}")
+    # Targets buffering the definitions write them out before the invocation ends, a failed write fails
+    # the invocation so that the event or the whole message batch is retried
+    try:
+        if "Records" in event.keys():
+            return sync_records(event["Records"])
+        sync_event(event)
+    finally:
+        target.flush()
 
     return {
         'statusCode': 200
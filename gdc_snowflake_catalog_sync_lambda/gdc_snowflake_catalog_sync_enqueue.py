@@ -0,0 +1,45 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+
+import hashlib
+import json
+import os
+
+import boto3
+
+# SQS FIFO message group id limit
+MAX_MESSAGE_GROUP_ID_LENGTH = 128
+
+sqs = boto3.client("sqs")
+
+
+# Helper to build the FIFO message group id catalog/database/table from the CloudTrail event
+def message_group_id(event: dict) -> str:
+    request_parameters = event["requestParameters"]
+    if "catalogId" in request_parameters.keys():
+        catalog_id = request_parameters["catalogId"]
+    else:
+        catalog_id = event["userIdentity"]["accountId"]
+    group_id = "/".join(
+        [catalog_id, request_parameters["databaseName"], request_parameters["tableInput"]["name"]]
+    )
+    if len(group_id) > MAX_MESSAGE_GROUP_ID_LENGTH:
+        group_id = hashlib.sha256(group_id.encode("utf-8")).hexdigest()
+    return group_id
+
+
+def handler(event, context):
+    print(f"Incoming event: {event}")
+    group_id = message_group_id(event["detail"])
+    sqs.send_message(
+        QueueUrl=os.environ["QUEUE_URL"],
+        MessageBody=json.dumps(event),
+        MessageGroupId=group_id,
+        MessageDeduplicationId=event["id"],
+    )
+    print(f"Glue Table event queued for {group_id}")
+
+    return {
+        'statusCode': 200
+    }
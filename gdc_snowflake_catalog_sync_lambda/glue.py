@@ -25,3 +25,40 @@ class Glue:
         return self.client.get_table(
             CatalogId=catalog, DatabaseName=database, Name=table
         )
+
+    def get_partition_location(self, catalog: str, database: str, table: str):
+        """
+        Gets the storage location of a sample partition of a Glue Table
+        """
+        paginator = self.client.get_paginator("get_partitions")
+        params = {"DatabaseName": database, "TableName": table, "PaginationConfig": {"MaxItems": 1, "PageSize": 1}}
+        if catalog is not None:
+            params["CatalogId"] = catalog
+        for page in paginator.paginate(**params):
+            for partition in page["Partitions"]:
+                return partition["StorageDescriptor"]["Location"]
+        return None
+
+    def get_databases(self, catalog: str):
+        """
+        Pages through all Glue Database names of a catalog
+        """
+        paginator = self.client.get_paginator("get_databases")
+        params = {}
+        if catalog is not None:
+            params["CatalogId"] = catalog
+        for page in paginator.paginate(**params):
+            for database in page["DatabaseList"]:
+                yield database["Name"]
+
+    def get_tables(self, catalog: str, database: str):
+        """
+        Pages through all Glue Table definitions of a database
+        """
+        paginator = self.client.get_paginator("get_tables")
+        params = {"DatabaseName": database}
+        if catalog is not None:
+            params["CatalogId"] = catalog
+        for page in paginator.paginate(**params):
+            for table in page["TableList"]:
+                yield table
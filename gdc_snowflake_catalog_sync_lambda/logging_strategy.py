@@ -14,6 +14,7 @@ class GCDLogging(TargetStrategy):
         logging.info("Logging :: build")
         return GCDLogging()
 
-    def synchronize(self, table_definitions: List[TableDefinition]) -> None:
+    def synchronize(self, table_definitions: List[TableDefinition]) -> bool:
         logging.info("Logging :: synchronize")
         logging.info(f"Table Definition={table_definitions}")
+        return True
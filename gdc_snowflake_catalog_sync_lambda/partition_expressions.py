@@ -0,0 +1,178 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+
+import argparse
+from typing import List, Optional
+
+from enums import PartitionStyle
+
+# Column types that need no cast from the file name parts
+STRING_TYPES = ["STRING", "VARCHAR", "CHAR", "TEXT"]
+
+
+class Filename:
+    """
+    The metadata$filename pseudo column, the file path relative to the stage
+    """
+
+    def sql(self) -> str:
+        return "metadata$filename"
+
+    def evaluate(self, filename: str) -> str:
+        return filename
+
+
+class Literal:
+    def __init__(self, value):
+        self.value = value
+
+    def sql(self) -> str:
+        if isinstance(self.value, str):
+            return "'" + self.value.replace("'", "''") + "'"
+        return str(self.value)
+
+    def evaluate(self, filename: str):
+        return self.value
+
+
+class Call:
+    """
+    A Snowflake function call that can be rendered as SQL and evaluated on a sample file name
+    """
+
+    def __init__(self, function: str, *args):
+        self.function = function
+        self.args = args
+
+    def sql(self) -> str:
+        return f"{self.function}({', '.join(arg.sql() for arg in self.args)})"
+
+    def evaluate(self, filename: str):
+        values = [arg.evaluate(filename) for arg in self.args]
+        return FUNCTIONS[self.function](*values)
+
+
+class Cast:
+    """
+    Cast to the declared partition type, evaluated as the uncast value
+    """
+
+    def __init__(self, expression, type: str):
+        self.expression = expression
+        self.type = type
+
+    def sql(self) -> str:
+        return f"{self.expression.sql()}::{self.type}"
+
+    def evaluate(self, filename: str):
+        return self.expression.evaluate(filename)
+
+
+def split_part(value: str, delimiter: str, part: int) -> str:
+    parts = value.split(delimiter)
+    if part == 0:
+        part = 1
+    index = part - 1 if part > 0 else len(parts) + part
+    return parts[index] if 0 <= index < len(parts) else ""
+
+
+def substr(value: str, start: int) -> str:
+    return value[start - 1:] if start > 0 else value[start:]
+
+
+def decode(value, search, result, default):
+    return result if value == search else default
+
+
+FUNCTIONS = {
+    "SPLIT_PART": split_part,
+    "SUBSTR": substr,
+    "DECODE": decode,
+}
+
+
+def detect_partition_style(location: str, partition_location: Optional[str], partition_names: List[str]) -> PartitionStyle:
+    """
+    Detects the partition layout from the storage location of a sample partition below the table location
+    """
+
+    if partition_location is None or not partition_location.startswith(location.rstrip("/")):
+        return PartitionStyle.UNKNOWN
+    segments = [segment for segment in partition_location[len(location.rstrip("/")):].split("/") if segment]
+    if len(segments) < len(partition_names):
+        return PartitionStyle.UNKNOWN
+    segments = segments[:len(partition_names)]
+    if all(segment.lower().startswith(name.lower() + "=") for segment, name in zip(segments, partition_names)):
+        return PartitionStyle.HIVE
+    if all("=" not in segment for segment in segments):
+        return PartitionStyle.POSITIONAL
+    return PartitionStyle.UNKNOWN
+
+
+def legacy_expression(index: int):
+    """
+    Partition value of both hive-style and positional paths
+    """
+
+    segment = Call("SPLIT_PART", Filename(), Literal("/"), Literal(index))
+    hive_value = Call("SPLIT_PART", segment, Literal("="), Literal(2))
+    return Call("DECODE", hive_value, Literal(""), segment, hive_value)
+
+
+def partition_expression(style: PartitionStyle, index: int, name: str, type: str, cast: bool = False):
+    """
+    Builds the cheapest expression returning the value of the partition at the path index
+    """
+
+    segment = Call("SPLIT_PART", Filename(), Literal("/"), Literal(index))
+    if style is PartitionStyle.HIVE:
+        expression = Call("SUBSTR", segment, Literal(len(name) + 2))
+    elif style is PartitionStyle.POSITIONAL:
+        expression = segment
+    else:
+        expression = legacy_expression(index)
+    if cast and type.upper() not in STRING_TYPES:
+        expression = Cast(expression, type)
+    return expression
+
+
+def main():
+    """
+    Compares the partition values of the generated expressions with the legacy expression on sample paths
+    """
+
+    parser = argparse.ArgumentParser(description="Compare partition expressions on sample file paths")
+    parser.add_argument("--stage", default="db.public.stage/customer", help="Stage and table path of the table")
+    parser.add_argument("--partition", action="append", help="Partition column name, repeatable")
+    parser.add_argument("--path", action="append", help="File path relative to the stage, repeatable")
+    args = parser.parse_args()
+
+    partitions = args.partition or ["country", "source"]
+    paths = args.path or [
+        "customer/country=US/source=LOB1/data.json",
+        "customer/country=IN/source=LOB2/part-0001.parquet",
+        "customer/US/LOB1/data.json",
+        "customer/DE/LOB3/part-0001.parquet",
+    ]
+    # The stage name is followed by the table path, whose segments lead the file paths relative to the stage
+    path_token_len = len(args.stage.rstrip("/").split("/"))
+    mismatches = 0
+    for path in paths:
+        segments = path.split("/")
+        location = "/".join(["s3://bucket"] + segments[:path_token_len - 1])
+        partition_location = "/".join([location] + segments[path_token_len - 1:-1])
+        style = detect_partition_style(location, partition_location, partitions)
+        for position, name in enumerate(partitions):
+            index = path_token_len + position
+            legacy = legacy_expression(index).evaluate(path)
+            expression = partition_expression(style, index, name, "string")
+            value = expression.evaluate(path)
+            status = "OK" if value == legacy else "MISMATCH"
+            mismatches += value != legacy
+            print(f"{status} {style.value} {path} {name}: {value!r} legacy {legacy!r} as {expression.sql()}")
+    print(f"{mismatches} mismatches")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+
+import os
+import queue
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from attr import dataclass
+from table_definition import TableDefinition
+from target_strategy import TargetStrategy
+
+DEFAULT_FETCH_CONCURRENCY = 4
+DEFAULT_RENDER_CONCURRENCY = 1
+DEFAULT_SUBMIT_CONCURRENCY = 2
+DEFAULT_QUEUE_SIZE = 10
+
+# Marks the end of the work items for the workers of a stage
+STOP = None
+
+
+@dataclass
+class WorkItem:
+    """
+    Defines a unit of work flowing through the pipeline
+    """
+
+    index: int
+    key: str
+    key_sequence: int
+    request: Any
+    table_definitions: Optional[List[TableDefinition]] = None
+    rendered: Any = None
+    error: Optional[Exception] = None
+
+
+class Pipeline:
+    """
+    Fetches, renders and submits table definitions in concurrent stages connected by bounded queues.
+    Work items with the same key are submitted in the order they were given; a failure skips
+    the remaining work items of that key.
+    """
+
+    def __init__(
+        self,
+        strategy: TargetStrategy,
+        fetch: Callable[[Any], Optional[List[TableDefinition]]],
+        fetch_concurrency: int = DEFAULT_FETCH_CONCURRENCY,
+        render_concurrency: int = DEFAULT_RENDER_CONCURRENCY,
+        submit_concurrency: int = DEFAULT_SUBMIT_CONCURRENCY,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+    ):
+        """
+        Defines pipeline instance
+        """
+
+        self.strategy = strategy
+        self.fetch = fetch
+        self.fetch_concurrency = fetch_concurrency
+        self.render_concurrency = render_concurrency
+        self.submit_concurrency = submit_concurrency
+        self.queue_size = queue_size
+
+    @classmethod
+    def build(cls, strategy: TargetStrategy, fetch: Callable[[Any], Optional[List[TableDefinition]]]):
+        """
+        Build the pipeline configuration from environment
+        """
+
+        return Pipeline(
+            strategy=strategy,
+            fetch=fetch,
+            fetch_concurrency=int(os.getenv("PIPELINE_FETCH_CONCURRENCY", DEFAULT_FETCH_CONCURRENCY)),
+            render_concurrency=int(os.getenv("PIPELINE_RENDER_CONCURRENCY", DEFAULT_RENDER_CONCURRENCY)),
+            submit_concurrency=int(os.getenv("PIPELINE_SUBMIT_CONCURRENCY", DEFAULT_SUBMIT_CONCURRENCY)),
+            queue_size=int(os.getenv("PIPELINE_QUEUE_SIZE", DEFAULT_QUEUE_SIZE)),
+        )
+
+    def run(self, requests: List[Tuple[str, Any]]) -> List[bool]:
+        """
+        Runs the (key, request) pairs through the pipeline and returns the result of each pair in order
+        """
+
+        key_sequences: Dict[str, int] = {}
+        fetch_queue = queue.Queue()
+        for index, (key, request) in enumerate(requests):
+            key_sequence = key_sequences.get(key, 0)
+            key_sequences[key] = key_sequence + 1
+            fetch_queue.put(WorkItem(index=index, key=key, key_sequence=key_sequence, request=request))
+        render_queue = queue.Queue(maxsize=self.queue_size)
+        submit_queue = queue.Queue(maxsize=self.queue_size)
+
+        self.results: List[bool] = [False] * len(requests)
+        self.lock = threading.Lock()
+        self.next_sequence: Dict[str, int] = {key: 0 for key in key_sequences}
+        self.parked: Dict[str, Dict[int, WorkItem]] = {key: {} for key in key_sequences}
+        self.failed_keys = set()
+
+        stages = [
+            (self.fetch_concurrency, self.fetch_stage, fetch_queue, render_queue),
+            (self.render_concurrency, self.render_stage, render_queue, submit_queue),
+            (self.submit_concurrency, self.submit_stage, submit_queue, None),
+        ]
+        workers = [
+            [
+                threading.Thread(target=self.worker, args=(stage, inbound, outbound), daemon=True)
+                for _ in range(max(concurrency, 1))
+            ]
+            for concurrency, stage, inbound, outbound in stages
+        ]
+        for stage_workers in workers:
+            for worker in stage_workers:
+                worker.start()
+        for stage_workers, (_, _, inbound, _) in zip(workers, stages):
+            for _ in stage_workers:
+                inbound.put(STOP)
+            for worker in stage_workers:
+                worker.join()
+
+        return self.results
+
+    @staticmethod
+    def worker(stage: Callable[[WorkItem], None], inbound: queue.Queue, outbound: Optional[queue.Queue]):
+        """
+        Takes work items from the inbound queue until stopped and passes them on to the outbound queue
+        """
+
+        while True:
+            item = inbound.get()
+            if item is STOP:
+                return
+            stage(item)
+            if outbound is not None:
+                outbound.put(item)
+
+    def fetch_stage(self, item: WorkItem):
+        try:
+            item.table_definitions = self.fetch(item.request)
+        except Exception as err:
+            print(f"Pipeline fetch failed for {item.key}: {err}")
+            item.error = err
+
+    def render_stage(self, item: WorkItem):
+        if item.error is not None or item.table_definitions is None:
+            return
+        try:
+            item.rendered = self.strategy.render(item.table_definitions)
+        except Exception as err:
+            print(f"Pipeline render failed for {item.key}: {err}")
+            item.error = err
+
+    def submit_stage(self, item: WorkItem):
+        """
+        Submits the work item once all earlier work items of its key are done, otherwise parks it.
+        The worker completing a work item submits the parked successors of the same key.
+        """
+
+        with self.lock:
+            if self.next_sequence[item.key] != item.key_sequence:
+                self.parked[item.key][item.key_sequence] = item
+                return
+        while item is not None:
+            self.complete(item)
+            with self.lock:
+                self.next_sequence[item.key] += 1
+                item = self.parked[item.key].pop(self.next_sequence[item.key], None)
+
+    def complete(self, item: WorkItem):
+        with self.lock:
+            key_failed = item.key in self.failed_keys
+        if key_failed:
+            print(f"Pipeline skipped {item.key} after an earlier failure")
+            result = False
+        elif item.error is not None:
+            result = False
+        elif item.table_definitions is None:
+            print(f"Glue Table Extract Failed: {item.request}")
+            result = True
+        else:
+            try:
+                result = self.strategy.submit(item.rendered) is not False
+            except Exception as err:
+                print(f"Pipeline submit failed for {item.key}: {err}")
+                result = False
+        self.results[item.index] = result
+        if not result:
+            with self.lock:
+                self.failed_keys.add(item.key)
@@ -0,0 +1,203 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+
+import argparse
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timezone
+
+# Fraction of the invocations to profile, profiling is disabled when not set
+SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp/gdc_profiles")
+PROFILE_S3_URI = os.getenv("PROFILE_S3_URI")
+PROFILE_TOP_N = int(os.getenv("PROFILE_TOP_N", "25"))
+
+
+class Capture:
+    """
+    Captures cProfile stats and tracemalloc allocations of one sampled call.
+    Threads started during the capture, like the pipeline workers, get their own profile
+    that is merged into the stats. Profiled functions called while the capture is active are recorded as spans.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.spans = []
+        self.lock = threading.Lock()
+        self.profile = cProfile.Profile()
+        self.thread_profiles = []
+
+    def profile_thread(self, frame, event, arg):
+        """
+        Profile hook of the threads started during the capture, replaced by a cProfile of the thread on its first event
+        """
+
+        sys.setprofile(None)
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+ allows a single active profiler, which then already sees all threads
+            return
+        with self.lock:
+            self.thread_profiles.append((threading.current_thread(), profile))
+
+    def start(self):
+        self.started = datetime.now(timezone.utc)
+        self.clock = time.perf_counter()
+        tracemalloc.start(10)
+        threading.setprofile(self.profile_thread)
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+        threading.setprofile(None)
+        self.seconds = time.perf_counter() - self.clock
+        self.snapshot = tracemalloc.take_snapshot()
+        self.current_bytes, self.peak_bytes = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.stats = pstats.Stats(self.profile)
+        with self.lock:
+            thread_profiles = list(self.thread_profiles)
+        for thread, profile in thread_profiles:
+            # A profile can only be stopped by its own thread, the ones still running are left out
+            if thread.is_alive():
+                print(f"Profile of thread {thread.name} skipped, thread still running")
+                continue
+            try:
+                self.stats.add(profile)
+            except TypeError:
+                pass
+
+    def add_span(self, span: dict):
+        with self.lock:
+            self.spans.append(span)
+
+    def summary(self) -> dict:
+        stats_text = io.StringIO()
+        self.stats.stream = stats_text
+        self.stats.sort_stats("cumulative").print_stats(PROFILE_TOP_N)
+        return {
+            "name": self.name,
+            "started": self.started.isoformat(),
+            "seconds": self.seconds,
+            "traced_bytes": self.current_bytes,
+            "peak_traced_bytes": self.peak_bytes,
+            "profiled_threads": len(self.thread_profiles),
+            "spans": self.spans,
+            "top_allocations": [
+                {"location": str(stat.traceback), "size": stat.size, "count": stat.count}
+                for stat in self.snapshot.statistics("lineno")[:PROFILE_TOP_N]
+            ],
+            "top_functions": stats_text.getvalue(),
+        }
+
+    def write(self):
+        """
+        Writes the .pstats file and the JSON summary to the profile folder and the optional S3 sink
+        """
+
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        timestamp = self.started.strftime("%Y%m%dT%H%M%S")
+        base_name = f"{timestamp}-{self.name}-{uuid.uuid4().hex[:8]}"
+        stats_path = os.path.join(PROFILE_DIR, f"{base_name}.pstats")
+        summary_path = os.path.join(PROFILE_DIR, f"{base_name}.json")
+        self.stats.dump_stats(stats_path)
+        with open(summary_path, "w") as summary_file:
+            json.dump(self.summary(), summary_file, indent=2)
+        print(f"Profile written to {stats_path} and {summary_path}")
+        if PROFILE_S3_URI:
+            from s3 import S3
+
+            s3 = S3()
+            for path in [stats_path, summary_path]:
+                uri = s3.upload_file(path, PROFILE_S3_URI, os.path.basename(path))
+                print(f"Profile staged to {uri}")
+
+
+# The capture of the sampled invocation in progress, Lambda runs one invocation at a time per container
+active_capture = None
+
+
+def profiled(name: str, sample: bool = False):
+    """
+    Records the calls of the decorated function as spans of the active capture.
+    With sample set, a sampled fraction of the calls starts a capture, which is meant for the handler only.
+    Returns the function unchanged when profiling is disabled.
+    """
+
+    def decorator(func):
+        if SAMPLE_RATE <= 0:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            global active_capture
+            capture = active_capture
+            if capture is not None:
+                clock = time.perf_counter()
+                traced_bytes = tracemalloc.get_traced_memory()[0]
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    capture.add_span({
+                        "name": name,
+                        "thread": threading.current_thread().name,
+                        "seconds": time.perf_counter() - clock,
+                        "traced_bytes_delta": tracemalloc.get_traced_memory()[0] - traced_bytes,
+                    })
+            if not sample or random.random() >= SAMPLE_RATE:
+                return func(*args, **kwargs)
+            capture = Capture(name)
+            active_capture = capture
+            capture.start()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                capture.stop()
+                active_capture = None
+                try:
+                    capture.write()
+                except Exception as err:
+                    print(f"Profile write failed: {err}")
+
+        return wrapper
+
+    return decorator
+
+
+def main():
+    """
+    Runs the sync handler with profiling on a recorded event file
+    """
+
+    parser = argparse.ArgumentParser(description="Profile the sync handler on a recorded event")
+    parser.add_argument("--event", required=True, help="JSON file with a recorded EventBridge or SQS event")
+    parser.add_argument("--output", default="gdc_profiles", help="Folder for the .pstats and JSON summary files")
+    args = parser.parse_args()
+
+    with open(args.event) as event_file:
+        event = json.load(event_file)
+
+    # The sync modules import this module as profiling, so the settings are passed through environment
+    # and the modules are imported after enabling profiling for the decorators to wrap the functions
+    os.environ["PROFILE_SAMPLE_RATE"] = "1"
+    os.environ["PROFILE_DIR"] = args.output
+    import gdc_snowflake_catalog_sync
+
+    print(gdc_snowflake_catalog_sync.handler(event, None))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+
+import random
+import time
+import uuid
+from typing import Optional
+
+from state_store import LocalStateStore, StateStore
+
+
+class AdaptiveLimiter:
+    """
+    Limits the Snowflake SQL API submissions of an account and role.
+    A token bucket caps the request rate, an AIMD window caps the requests in flight: the window grows
+    by one request per window of successes and is cut on throttling or slow (queued) statements.
+    The tokens, the window and the leases of the requests in flight are kept in the state store and
+    updated with conditional puts, so a shared store admits requests across all Lambda containers.
+    """
+
+    def __init__(
+        self,
+        key: str,
+        rate: float = 5.0,
+        burst: int = 10,
+        initial_window: float = 4.0,
+        min_window: float = 1.0,
+        max_window: float = 32.0,
+        decrease: float = 0.5,
+        slow_seconds: float = 30.0,
+        lease_seconds: float = 120.0,
+        poll_seconds: float = 0.2,
+        store: Optional[StateStore] = None,
+    ):
+        """
+        Defines limiter instance
+        """
+
+        self.key = key
+        self.rate = rate
+        self.burst = burst
+        self.initial_window = initial_window
+        self.min_window = min_window
+        self.max_window = max_window
+        self.decrease = decrease
+        self.slow_seconds = slow_seconds
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.store = store or LocalStateStore()
+
+    @classmethod
+    def from_config(cls, key: str, config: dict, store: Optional[StateStore] = None):
+        """
+        Build the limiter from the ratelimit section of the target secret
+        """
+
+        settings = {
+            "rate": "rate",
+            "burst": "burst",
+            "initialwindow": "initial_window",
+            "minwindow": "min_window",
+            "maxwindow": "max_window",
+            "decrease": "decrease",
+            "slowseconds": "slow_seconds",
+            "leaseseconds": "lease_seconds",
+            "pollseconds": "poll_seconds",
+        }
+        return AdaptiveLimiter(
+            key=key,
+            store=store,
+            **{arg: config[name] for name, arg in settings.items() if name in config},
+        )
+
+    def current(self, now: float):
+        """
+        Reads the shared state, drops the leases of requests that outlived the lease and refills the tokens
+        """
+
+        state = self.store.get(self.key) or {}
+        leases = {lease: expires for lease, expires in state.get("leases", {}).items() if expires > now}
+        refilled = state.get("refilled", now)
+        tokens = min(self.burst, state.get("tokens", self.burst) + max(now - refilled, 0) * self.rate)
+        return {
+            **state,
+            "window": state.get("window", self.initial_window),
+            "leases": leases,
+            "tokens": tokens,
+            "refilled": now,
+        }
+
+    def backoff(self, conflicts: int):
+        """
+        Sleeps a jittered, exponentially growing time after a conditional put lost to another request
+        """
+
+        time.sleep(random.uniform(0, min(self.poll_seconds * 2 ** (conflicts - 1), 2.0)))
+
+    def acquire(self) -> Optional[str]:
+        """
+        Blocks until a token is available and the window has room for another request.
+        Returns the lease of the request, None when the state store could not be reached.
+        """
+
+        lease = uuid.uuid4().hex
+        conflicts = 0
+        while True:
+            now = time.time()
+            try:
+                state = self.current(now)
+                if len(state["leases"]) < max(int(state["window"]), 1) and state["tokens"] >= 1:
+                    state["leases"][lease] = now + self.lease_seconds
+                    state["tokens"] -= 1
+                    if self.store.put(self.key, state):
+                        return lease
+                    conflicts += 1
+                    self.backoff(conflicts)
+                    continue
+            except Exception as err:
+                print(f"Snowflake limiter {self.key} admission failed, request is not limited: {err}")
+                return None
+            wait = max((1 - state["tokens"]) / self.rate, self.poll_seconds)
+            time.sleep(wait + random.uniform(0, self.poll_seconds))
+
+    def release(self, lease: Optional[str], success: bool, throttled: bool, seconds: float):
+        """
+        Frees the lease of the request and adapts the window to the outcome of the request
+        """
+
+        if lease is None:
+            return
+        conflicts = 0
+        while True:
+            try:
+                state = self.current(time.time())
+                state["leases"].pop(lease, None)
+                if throttled or seconds >= self.slow_seconds:
+                    state["window"] = max(self.min_window, state["window"] * self.decrease)
+                elif success:
+                    state["window"] = min(self.max_window, state["window"] + 1 / state["window"])
+                if self.store.put(self.key, state):
+                    break
+            except Exception as err:
+                print(f"Snowflake limiter {self.key} release failed, lease expires after {self.lease_seconds}s: {err}")
+                return
+            conflicts += 1
+            self.backoff(conflicts)
+        if throttled or seconds >= self.slow_seconds:
+            print(f"Snowflake limiter {self.key} window decreased to {state['window']:.2f}")
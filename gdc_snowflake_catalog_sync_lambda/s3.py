@@ -0,0 +1,46 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+""" Amazon S3 Service resource definition """
+import boto3
+from botocore.config import Config
+
+
+class S3:
+    def __init__(self):
+        """
+        Defines S3 Service resource
+        """
+        this_config = Config(
+            retries={
+                'max_attempts': 3,
+                'mode': 'standard'
+            }
+        )
+        self.client = boto3.client("s3", config=this_config)
+
+    @staticmethod
+    def split_uri(uri: str):
+        """
+        Splits an s3://bucket/prefix uri into bucket and prefix
+        """
+        bucket, _, prefix = uri[len("s3://"):].partition("/")
+        return bucket, prefix.strip("/")
+
+    def upload_file(self, path: str, uri: str, name: str):
+        """
+        Uploads a local file under the given s3://bucket/prefix uri
+        """
+        bucket, prefix = S3.split_uri(uri)
+        key = f"{prefix}/{name}" if prefix else name
+        self.client.upload_file(path, bucket, key)
+        return f"s3://{bucket}/{key}"
+
+    def put_object(self, body: str, uri: str, name: str):
+        """
+        Writes the body as an object under the given s3://bucket/prefix uri
+        """
+        bucket, prefix = S3.split_uri(uri)
+        key = f"{prefix}/{name}" if prefix else name
+        self.client.put_object(Bucket=bucket, Key=key, Body=body.encode("utf-8"))
+        return f"s3://{bucket}/{key}"
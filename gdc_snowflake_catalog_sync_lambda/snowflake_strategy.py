@@ -5,14 +5,21 @@
 import json
 import logging
 import os
-from datetime import timedelta
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
 from typing import List
 
 import boto3
 import requests
 from attrs import define
 from jinja2 import Template
+from enums import PartitionStyle
 from jwt_generator import JWTGenerator
+from partition_expressions import detect_partition_style, partition_expression
+from profiling import profiled
+from rate_limiter import AdaptiveLimiter
+from state_store import StateStore
 from table_definition import TableDefinition
 from target_strategy import TargetStrategy
 
@@ -29,6 +36,42 @@ create_template = (
     " LOCATION=@{{ table_path }} AUTO_REFRESH = {{ auto_refresh }} FILE_FORMAT = (TYPE = {{ file_format }});"
 )
 
+# Jinja Template for Snowflake materialized view over an external table, replacing the view keeps its grants
+materialized_view_template = (
+    "CREATE OR REPLACE MATERIALIZED VIEW "
+    "{{ database_name }}.{{ view_name }} COPY GRANTS"
+    "{% if cluster_by|length > 0 %}"
+    " CLUSTER BY ({{ cluster_by }})"
+    "{% endif %}"
+    " AS SELECT {{ columns }} FROM {{ database_name }}.{{ table_name }};"
+)
+
+# Jinja Templates for Snowflake Iceberg table definition through a catalog integration,
+# an external table synced before the Glue table was converted to Iceberg is dropped first
+iceberg_migrate_template = (
+    "EXECUTE IMMEDIATE $$ BEGIN "
+    "IF (EXISTS(SELECT 1 FROM {{ snowflake_database }}.INFORMATION_SCHEMA.EXTERNAL_TABLES"
+    " WHERE TABLE_SCHEMA = UPPER('{{ snowflake_schema }}') AND TABLE_NAME = UPPER('{{ table_name }}'))) THEN "
+    "DROP EXTERNAL TABLE {{ database_name }}.{{ table_name }}; "
+    "END IF; END; $$;"
+)
+iceberg_create_template = (
+    "CREATE ICEBERG TABLE IF NOT EXISTS "
+    "{{ database_name }}.{{ table_name }}"
+    "{% if external_volume %} EXTERNAL_VOLUME = '{{ external_volume }}'{% endif %}"
+    " CATALOG = '{{ catalog }}'"
+    "{% if metadata_file_path %}"
+    " METADATA_FILE_PATH = '{{ metadata_file_path }}'"
+    "{% else %}"
+    " CATALOG_NAMESPACE = '{{ catalog_namespace }}' CATALOG_TABLE_NAME = '{{ catalog_table_name }}'"
+    "{% endif %};"
+)
+iceberg_refresh_template = (
+    "ALTER ICEBERG TABLE "
+    "{{ database_name }}.{{ table_name }} REFRESH"
+    "{% if metadata_file_path %} '{{ metadata_file_path }}'{% endif %};"
+)
+
 
 @define
 class Snowflake(TargetStrategy):
@@ -45,7 +88,12 @@ class Snowflake(TargetStrategy):
         username: str,
         password: str,
         stages: dict,
-        allowed_values: dict
+        allowed_values: dict,
+        limiter: AdaptiveLimiter = None,
+        max_attempts: int = 3,
+        partition_cast: bool = False,
+        iceberg: dict = None,
+        materialized_views: dict = None
     ):
         """
         Defines snowflake instance
@@ -57,11 +105,21 @@ class Snowflake(TargetStrategy):
         self.username = username
         self.password = password
         self.accountidentifier = accountidentifier
+        self.jwt_generator: JWTGenerator = None
         self.template: Template = Template(create_template)
         self.column_template: Template = Template(column_template)
         self.partition_template: Template = Template(partition_column_template)
         self.stages: dict = stages
         self.allowed_values: dict = allowed_values
+        self.limiter: AdaptiveLimiter = limiter
+        self.max_attempts: int = max_attempts
+        self.partition_cast: bool = partition_cast
+        self.iceberg: dict = iceberg
+        self.iceberg_migrate_template: Template = Template(iceberg_migrate_template)
+        self.iceberg_create_template: Template = Template(iceberg_create_template)
+        self.iceberg_refresh_template: Template = Template(iceberg_refresh_template)
+        self.materialized_views: dict = materialized_views or {}
+        self.materialized_view_template: Template = Template(materialized_view_template)
 
     @classmethod
     def build(cls):
@@ -72,14 +130,28 @@ class Snowflake(TargetStrategy):
         client = boto3.client("secretsmanager")
         response = client.get_secret_value(SecretId=os.getenv("SECRET_ARN"))
         snowflakesecrets = json.loads(response["SecretString"])
-        url = snowflakesecrets["url"]
-        warehouse = snowflakesecrets["warehouse"]
-        role = snowflakesecrets["role"]
-        username = snowflakesecrets["username"]
-        password = snowflakesecrets["private_key"]
-        accountidentifier = snowflakesecrets["accountidentifier"]
-        stages = snowflakesecrets["stages"]["s3"]
-        allowed_values = snowflakesecrets["allowedvalues"]
+        return Snowflake.from_config(snowflakesecrets)
+
+    @classmethod
+    def from_config(cls, config: dict):
+        """
+        Build the snowflake configuration from a secret shaped dictionary
+        """
+
+        url = config["url"]
+        warehouse = config["warehouse"]
+        role = config["role"]
+        username = config["username"]
+        password = config["private_key"]
+        accountidentifier = config["accountidentifier"]
+        stages = config["stages"]["s3"]
+        allowed_values = config["allowedvalues"]
+        rate_limit = config.get("ratelimit", {})
+        limiter = None
+        if "ratelimit" in config:
+            limiter = AdaptiveLimiter.from_config(
+                key=f"limiter#{accountidentifier}#{role}", config=rate_limit, store=StateStore.build()
+            )
         print(f"Stages available in snowflake secrets are: {stages}")
         return Snowflake(
             url=url,
@@ -89,7 +161,12 @@ class Snowflake(TargetStrategy):
             username=username,
             password=password,
             stages=stages,
-            allowed_values=allowed_values
+            allowed_values=allowed_values,
+            limiter=limiter,
+            max_attempts=rate_limit.get("maxattempts", 3),
+            partition_cast=config.get("partitioncast", False),
+            iceberg=config.get("iceberg"),
+            materialized_views=config.get("materializedviews")
         )
 
     @staticmethod
@@ -111,40 +188,113 @@ class Snowflake(TargetStrategy):
     def invoke_target(self, statement: str, statement_count: int):
         """
         Calls the snowflake SQL API for external table creation
+        Requests are admitted by the limiter and retried when Snowflake throttles them,
+        the token is renewed before it expires and once more when Snowflake rejects it
         """
 
         logging.info(f"Invoking Target {self.url}")
-        headers = {
-            "X-Snowflake-Authorization-Token-Type": "KEYPAIR_JWT",
-            "Authorization": "Bearer " + self.token,
-        }
         payload = {
             "statement": statement,
             "parameters": {"MULTI_STATEMENT_COUNT": statement_count},
             "role": self.role,
         }
-        resp = requests.post(
-            url=self.url, data=json.dumps(payload), headers=headers
-        )
+        attempt = 1
+        renewed = False
+        while True:
+            resp = self.post(payload, self.headers())
+            if resp.status_code == 401 and not renewed:
+                print("Snowflake rejected the token, renewing it")
+                self.generate_token()
+                renewed = True
+                continue
+            if resp.status_code != 429 or attempt >= self.max_attempts:
+                break
+            wait = Snowflake.retry_after(resp.headers.get("Retry-After"), 2 ** attempt)
+            print(f"Snowflake throttled the request, retrying in {wait} seconds")
+            time.sleep(wait)
+            attempt += 1
         if resp.status_code == 200:
             print("Table Operation Successful")
+            return True
+        elif resp.status_code == 202:
+            # The statement was accepted and keeps running in Snowflake, submitting it again would run it twice
+            print(f"Table Operation Accepted, statementHandle={resp.json().get('statementHandle')}")
+            return True
         else:
             print("Table Operation Failed")
             print(f" Response={resp}")
             print(f" Response={resp.text}")
+            return False
+
+    @staticmethod
+    def retry_after(value: str, default: float) -> float:
+        """
+        Seconds to wait from a Retry-After header given in seconds or as an HTTP date
+        """
+
+        if value is None:
+            return default
+        try:
+            return max(float(value), 0)
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return default
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0)
+
+    def post(self, payload: dict, headers: dict):
+        """
+        Posts the statement to the snowflake SQL API within the limiter window.
+        Throttled (429) and still running (202) statements shrink the window.
+        """
+
+        if self.limiter is None:
+            return requests.post(url=self.url, data=json.dumps(payload), headers=headers)
+        lease = self.limiter.acquire()
+        started = time.monotonic()
+        try:
+            resp = requests.post(url=self.url, data=json.dumps(payload), headers=headers)
+        except Exception:
+            self.limiter.release(lease, success=False, throttled=False, seconds=time.monotonic() - started)
+            raise
+        self.limiter.release(
+            lease,
+            success=resp.status_code == 200,
+            throttled=resp.status_code in [202, 429],
+            seconds=time.monotonic() - started,
+        )
+        return resp
+
+    def headers(self) -> dict:
+        """
+        SQL API headers with the current token, the generator renews the token after its renewal delay
+        """
+
+        if self.jwt_generator is None:
+            self.generate_token()
+        self.token = self.jwt_generator.get_token()
+        return {
+            "X-Snowflake-Authorization-Token-Type": "KEYPAIR_JWT",
+            "Authorization": "Bearer " + self.token,
+        }
 
     def generate_token(self):
         """
-        creates JWT token
+        creates JWT token, renewed 5 minutes before it expires
         """
 
-        self.token = JWTGenerator(
+        self.jwt_generator = JWTGenerator(
             self.accountidentifier,
             self.username,
             self.password,
             timedelta(minutes=60),
-            timedelta(minutes=60),
-        ).get_token()
+            timedelta(minutes=55),
+        )
+        self.token = self.jwt_generator.get_token()
 
     def auto_generate_token(func):
         def wrapper(self, *args, **kwargs):
@@ -157,58 +307,173 @@ class Snowflake(TargetStrategy):
 
         return wrapper
 
-    @auto_generate_token
-    def synchronize(self, table_definitions: list[TableDefinition]) -> None:
+    def render_table(self, table_definition: TableDefinition) -> List[str]:
         """
-        Parses the Glue table definition and builds Snowflake external table definition
-        Invokes Snowflake SQL API to create/update external table definition
+        Parses the Glue table definition and builds the Snowflake statements for it.
+        Returns an empty list when the table cannot be synced.
         """
 
-        statement = ""
+        if table_definition.is_iceberg:
+            return self.render_iceberg_table(table_definition)
         allowed_file_formats: List = self.allowed_values["fileformats"]
-        for table_definition in table_definitions:
-            if table_definition.file_format.upper() in allowed_file_formats :
-                stage_name = Snowflake.find_stage(table_definition.location, self.stages)
-                if stage_name is None:
-                    print(f"Could not find stage for {table_definition.location}")
-                else:
-                    columns: List[str] = [
-                        self.column_template.render({"name": column.name, "type": column.type})
-                        for column in table_definition.columns
-                    ]
-                    partition_columns: List[str] = []
-                    if len(table_definition.partitions) > 0:
-                        path_token_len = len(stage_name.rstrip("/").split("/"))
-                    for index, partition in enumerate(table_definition.partitions):
-                        partindex = path_token_len + index
-                        partition_function = f"DECODE(SPLIT_PART(SPLIT_PART(metadata$filename, '/', {partindex}),'=',2),'',SPLIT_PART(metadata$filename, '/', {partindex}),SPLIT_PART(SPLIT_PART(metadata$filename, '/', {partindex}),'=',2))"
-                        partition_columns.append(
-                            self.partition_template.render(
-                                {
-                                    "column_name": partition.name,
-                                    "column_type": partition.type,
-                                    "function": partition_function,
-                                }
-                            )
-                        )
-                    data = {
-                        "database_name": table_definition.database.replace("__", "."),
-                        "table_name": table_definition.name,
-                        "columns": ",".join(columns + partition_columns),
-                        "partitions": ",".join(
-                            [partition.name for partition in table_definition.partitions]
-                        ),
-                        "table_path": stage_name,
-                        "auto_refresh": "true",
-                        "file_format": table_definition.file_format,
+        if table_definition.file_format.upper() not in allowed_file_formats:
+            print(f"File format {table_definition.file_format} is not allowed for {table_definition.name}")
+            return []
+        stage_name = Snowflake.find_stage(table_definition.location, self.stages)
+        if stage_name is None:
+            print(f"Could not find stage for {table_definition.location}")
+            return []
+        columns: List[str] = [
+            self.column_template.render({"name": column.name, "type": column.type})
+            for column in table_definition.columns
+        ]
+        partition_columns: List[str] = []
+        if len(table_definition.partitions) > 0:
+            path_token_len = len(stage_name.rstrip("/").split("/"))
+            partition_style: PartitionStyle = detect_partition_style(
+                table_definition.location,
+                table_definition.partition_location,
+                [partition.name for partition in table_definition.partitions],
+            )
+            print(f"Partition style of {table_definition.name} is {partition_style.value}")
+        for index, partition in enumerate(table_definition.partitions):
+            partindex = path_token_len + index
+            partition_function = partition_expression(
+                partition_style, partindex, partition.name, partition.type, cast=self.partition_cast
+            ).sql()
+            partition_columns.append(
+                self.partition_template.render(
+                    {
+                        "column_name": partition.name,
+                        "column_type": partition.type,
+                        "function": partition_function,
                     }
-                    sql = self.template.render(data)
-                    statement = sql + statement
+                )
+            )
+        data = {
+            "database_name": table_definition.database.replace("__", "."),
+            "table_name": table_definition.name,
+            "columns": ",".join(columns + partition_columns),
+            "partitions": ",".join(
+                [partition.name for partition in table_definition.partitions]
+            ),
+            "table_path": stage_name,
+            "auto_refresh": "true",
+            "file_format": table_definition.file_format,
+        }
+        return [self.template.render(data)] + self.render_materialized_view(table_definition)
+
+    def render_materialized_view(self, table_definition: TableDefinition) -> List[str]:
+        """
+        Builds the materialized view over the external table when configured for the Glue table or database.
+        The view is replaced with every sync, as replacing the external table invalidates it.
+        """
+
+        settings = self.materialized_views.get(
+            f"{table_definition.database}.{table_definition.name}",
+            self.materialized_views.get(table_definition.database),
+        )
+        if settings is None or not settings.get("enabled", True):
+            return []
+        # Snowflake resolves the unquoted column names case-insensitively
+        table_columns = [column.name for column in table_definition.columns + table_definition.partitions]
+        columns = settings.get("columns", table_columns)
+        unknown_columns = [
+            column for column in columns if column.upper() not in [name.upper() for name in table_columns]
+        ]
+        if len(unknown_columns) > 0:
+            print(f"Materialized view of {table_definition.name} skipped, unknown columns {unknown_columns}")
+            return []
+        # The view can only be clustered by the columns it selects
+        unselected_columns = [
+            column for column in settings.get("clusterby", []) if column.upper() not in [name.upper() for name in columns]
+        ]
+        if len(unselected_columns) > 0:
+            print(f"Materialized view of {table_definition.name} skipped, cluster by columns {unselected_columns} not selected")
+            return []
+        if len(columns) == 0:
+            return []
+        data = {
+            "database_name": table_definition.database.replace("__", "."),
+            "view_name": table_definition.name + settings.get("suffix", "_mv"),
+            "table_name": table_definition.name,
+            "columns": ",".join(columns),
+            "cluster_by": ",".join(settings.get("clusterby", [])),
+        }
+        return [self.materialized_view_template.render(data)]
+
+    def render_iceberg_table(self, table_definition: TableDefinition) -> List[str]:
+        """
+        Builds the Snowflake Iceberg table statements for a Glue Iceberg table definition.
+        An external table of the same name is dropped, the table is created through the catalog integration
+        when missing and refreshed from the latest metadata.
+        """
+
+        if self.iceberg is None or "catalog" not in self.iceberg:
+            print(f"No Iceberg catalog integration configured for {table_definition.name}")
+            return []
+        metadata_file_path = None
+        if self.iceberg.get("catalogsource", "GLUE").upper() == "OBJECT_STORE":
+            # Object store catalog integrations read the metadata file relative to the external volume
+            base_location = self.iceberg.get("externalvolumelocation", "").rstrip("/") + "/"
+            if table_definition.metadata_location is None or not table_definition.metadata_location.startswith(base_location):
+                print(f"Metadata location {table_definition.metadata_location} is not in the external volume")
+                return []
+            metadata_file_path = table_definition.metadata_location[len(base_location):]
+        snowflake_database, _, snowflake_schema = table_definition.database.partition("__")
+        data = {
+            "database_name": table_definition.database.replace("__", "."),
+            "snowflake_database": snowflake_database,
+            "snowflake_schema": snowflake_schema,
+            "table_name": table_definition.name,
+            "external_volume": self.iceberg.get("externalvolume"),
+            "catalog": self.iceberg["catalog"],
+            "catalog_namespace": table_definition.database,
+            "catalog_table_name": table_definition.name,
+            "metadata_file_path": metadata_file_path,
+        }
+        print(f"Iceberg metadata location of {table_definition.name} is {table_definition.metadata_location}")
+        return [
+            self.iceberg_migrate_template.render(data),
+            self.iceberg_create_template.render(data),
+            self.iceberg_refresh_template.render(data),
+        ]
+
+    @profiled("Snowflake.render")
+    def render(self, table_definitions: List[TableDefinition]) -> List[str]:
+        """
+        Builds the Snowflake statements for a list of Glue table definitions
+        """
+
+        statements: List[str] = []
+        for table_definition in table_definitions:
+            statements = self.render_table(table_definition) + statements
+        return statements
+
+    @profiled("Snowflake.submit")
+    @auto_generate_token
+    def submit(self, statements: List[str]) -> bool:
+        """
+        Invokes Snowflake SQL API with the rendered statements
+        Returns False when the SQL API call failed
+        """
+
+        statement = "".join(statements)
         print(f"Snowflake Table definition: {statement}")
-        if len(table_definitions) > 0 and len(statement) > 0:
-            statement_count = len(table_definitions)
-            self.invoke_target(statement,statement_count)
+        if len(statement) > 0:
+            statement_count = len(statements)
+            return self.invoke_target(statement,statement_count)
         else:
             print(f"Table Sync failed for statement: {statement}")
 
-        pass
+        return True
+
+    @profiled("Snowflake.synchronize")
+    def synchronize(self, table_definitions: List[TableDefinition]) -> bool:
+        """
+        Parses the Glue table definition and builds Snowflake external table definition
+        Invokes Snowflake SQL API to create/update external table definition
+        Returns False when the SQL API call failed
+        """
+
+        return self.submit(self.render(table_definitions))
@@ -0,0 +1,113 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+""" State stores shared by the sync functions """
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, Optional
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+
+class StateStore(ABC):
+    """
+    Stores small JSON states by key. Every state carries a version, put only succeeds
+    when the version of the given state is still the stored one.
+    """
+
+    @classmethod
+    def build(cls, variable: str = "STATE_TABLE"):
+        """
+        Build the DynamoDB state store when the environment variable names a state table, otherwise a local one
+        """
+        table_name = os.getenv(variable)
+        if table_name:
+            return DynamoDBStateStore(table_name=table_name)
+        return LocalStateStore()
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[dict]:
+        pass
+
+    @abstractmethod
+    def put(self, key: str, state: dict) -> bool:
+        pass
+
+
+class LocalStateStore(StateStore):
+    """
+    In memory state store, shared within a Lambda container only
+    """
+
+    def __init__(self):
+        self.states: Dict[str, dict] = {}
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[dict]:
+        with self.lock:
+            state = self.states.get(key)
+            return dict(state) if state is not None else None
+
+    def put(self, key: str, state: dict) -> bool:
+        with self.lock:
+            stored = self.states.get(key)
+            if (stored or {}).get("version") != state.get("version"):
+                return False
+            self.states[key] = {**state, "version": (state.get("version") or 0) + 1}
+            return True
+
+
+class DynamoDBStateStore(StateStore):
+    """
+    DynamoDB state store, shared across Lambda containers
+    """
+
+    def __init__(self, table_name: str):
+        this_config = Config(
+            retries={
+                'max_attempts': 3,
+                'mode': 'standard'
+            }
+        )
+        self.table_name = table_name
+        self.client = boto3.client("dynamodb", config=this_config)
+
+    def get(self, key: str) -> Optional[dict]:
+        response = self.client.get_item(
+            TableName=self.table_name, Key={"pk": {"S": key}}, ConsistentRead=True
+        )
+        if "Item" not in response:
+            return None
+        state = json.loads(response["Item"]["state"]["S"])
+        state["version"] = int(response["Item"]["version"]["N"])
+        return state
+
+    def put(self, key: str, state: dict) -> bool:
+        version = state.get("version")
+        stored_state = {k: v for k, v in state.items() if k != "version"}
+        if version is None:
+            condition = {"ConditionExpression": "attribute_not_exists(pk)"}
+        else:
+            condition = {
+                "ConditionExpression": "version = :version",
+                "ExpressionAttributeValues": {":version": {"N": str(version)}},
+            }
+        try:
+            self.client.put_item(
+                TableName=self.table_name,
+                Item={
+                    "pk": {"S": key},
+                    "state": {"S": json.dumps(stored_state)},
+                    "version": {"N": str((version or 0) + 1)},
+                },
+                **condition,
+            )
+        except ClientError as err:
+            if err.response["Error"]["Code"] == "ConditionalCheckFailedException":
+                return False
+            raise
+        return True
@@ -4,6 +4,8 @@
 
 from typing import List
 from attr import dataclass
+from enums import TableType
+from profiling import profiled
 
 
 @dataclass
@@ -25,8 +27,16 @@ class TableDefinition:
     partitions: List[Column]
     location: str
     file_format: str
+    partition_location: str = None
+    table_type: str = None
+    metadata_location: str = None
+
+    @property
+    def is_iceberg(self) -> bool:
+        return self.table_type == TableType.ICEBERG.value
 
     @classmethod
+    @profiled("TableDefinition.from_get_table")
     def from_get_table(cls, get_table_response: dict):
         """
         Build table definition
@@ -35,7 +45,15 @@ class TableDefinition:
         table_input = get_table_response["Table"]
         if "StorageDescriptor" in get_table_response["Table"].keys():
             columns = table_input["StorageDescriptor"]["Columns"]
-            partitions = table_input["PartitionKeys"]
+            partitions = table_input.get("PartitionKeys", [])
+            parameters = table_input.get("Parameters", {})
+            if parameters.get("table_type", "").upper() == TableType.ICEBERG.value:
+                # Iceberg tables are read through their metadata, the data file format is informational
+                table_type = TableType.ICEBERG.value
+                file_format = parameters.get("classification", "iceberg")
+            else:
+                table_type = table_input.get("TableType")
+                file_format = parameters["classification"]
             return [
                 TableDefinition(
                     database=table_input["DatabaseName"],
@@ -49,7 +67,9 @@ class TableDefinition:
                         for partition in partitions
                     ],
                     location=table_input["StorageDescriptor"]["Location"],
-                    file_format=table_input["Parameters"]["classification"],
+                    file_format=file_format,
+                    table_type=table_type,
+                    metadata_location=parameters.get("metadata_location"),
                 )
             ]
         else:
@@ -3,7 +3,7 @@
 
 
 from abc import ABC, abstractmethod
-from typing import List
+from typing import Any, List
 
 from table_definition import TableDefinition
 
@@ -15,7 +15,25 @@ class TargetStrategy(ABC):
         pass
 
     @abstractmethod
-    def synchronize(self, table_definitions: List[TableDefinition]) -> None:
+    def synchronize(self, table_definitions: List[TableDefinition]) -> bool:
+        pass
+
+    def render(self, table_definitions: List[TableDefinition]) -> Any:
+        """
+        Prepares the table definitions for submit, targets without a separate render step pass them through
+        """
+        return table_definitions
+
+    def submit(self, rendered: Any) -> bool:
+        """
+        Sends the rendered table definitions to the target
+        """
+        return self.synchronize(table_definitions=rendered)
+
+    def flush(self):
+        """
+        Writes out the table definitions buffered by the target, called at the end of every invocation
+        """
         pass
 
 